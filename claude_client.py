@@ -1,15 +1,13 @@
-import os
-import json
 import requests
 import time
 from typing import Dict, List, Any, Optional
 
-CLAUDE_API_KEY = os.environ.get("CLAUDE_API_KEY", "")
+from config import CFG
+
 CLAUDE_API_URL = "https://api.anthropic.com/v1/messages"
-MCP_SERVER_URL = os.environ.get("MCP_SERVER_URL", "http://localhost:5001")
 
 class ClaudeClient:
-    def __init__(self, api_key: str = CLAUDE_API_KEY, model: str = "claude-3-opus-20240229"):
+    def __init__(self, api_key: str = CFG.claude_api_key, model: str = "claude-3-opus-20240229"):
         self.api_key = api_key
         self.model = model
         self.headers = {
@@ -33,14 +31,12 @@ class ClaudeClient:
             }
         }]
 
-        self._check_mcp_server()
-
     def _check_mcp_server(self):
         try:
-            response = requests.get(f"{MCP_SERVER_URL}/health", timeout=2)
+            response = requests.get(f"{CFG.mcp_server_url}/health", timeout=2)
             if response.status_code == 200:
                 return True
-        except:
+        except requests.exceptions.RequestException:
             pass
         return False
     
@@ -120,7 +116,7 @@ class ClaudeClient:
         while retry_count < max_retries:
             try:
                 response = requests.post(
-                    f"{MCP_SERVER_URL}/tool_call",
+                    f"{CFG.mcp_server_url}/tool_call",
                     json={"name": tool_name, "parameters": tool_params},
                     timeout=10
                 )
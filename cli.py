@@ -1,14 +1,12 @@
 import sys
-import os
 import requests
 import argparse
-import json
 from claude_client import ClaudeClient
+from config import CFG
 
 def check_mcp_server():
-    mcp_url = os.environ.get("MCP_SERVER_URL", "http://localhost:5001")
     try:
-        response = requests.get(f"{mcp_url}/health", timeout=2)
+        response = requests.get(f"{CFG.mcp_server_url}/health", timeout=2, allow_redirects=False)
         if response.status_code == 200:
             return True
         return False
@@ -18,9 +16,10 @@ def check_mcp_server():
 def main():
     parser = argparse.ArgumentParser(description="Claude web search interface with MCP integration")
     parser.add_argument("query", nargs="*", help="The question to ask Claude")
+    parser.add_argument("--check-mcp", action="store_true", help="Probe the MCP server health endpoint before asking")
     args = parser.parse_args()
 
-    if not os.environ.get("CLAUDE_API_KEY"):
+    if not CFG.claude_api_key:
         print("Missing CLAUDE_API_KEY. Set it in your environment.")
         sys.exit(1)
 
@@ -29,6 +28,9 @@ def main():
     else:
         query = input("Enter your question: ")
     
+    if args.check_mcp and not check_mcp_server():
+        print("Warning: MCP server is not reachable; web search tool calls will fail.")
+
     client = ClaudeClient()
 
     print(f"Searching: {query}")
@@ -0,0 +1,93 @@
+import os
+import functools
+from dataclasses import dataclass
+
+def _env_str(name: str, default: str) -> str:
+    return os.environ.get(name, default)
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"[WARN] Invalid integer for {name} | value={value} | default={default}")
+        return default
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"[WARN] Invalid number for {name} | value={value} | default={default}")
+        return default
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() == "true"
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Settings read once from the environment."""
+    # Brave Search
+    brave_api_base: str
+    brave_api_key: str
+    # HTTP
+    http_timeout_seconds: int
+    retry_attempts: int
+    retry_backoff_base_seconds: float
+    retry_backoff_max_seconds: float
+    # Search features
+    enable_enrichment: bool
+    enable_rerank: bool
+    enable_speculative_fanout: bool
+    # Caching
+    cache_backend: str
+    cache_ttl_seconds: int
+    cache_db_path: str
+    cache_sweep_interval_seconds: int
+    memory_cache_size: int
+    extraction_cache_size: int
+    # Claude / MCP
+    claude_api_key: str
+    mcp_server_url: str
+    port: int
+    log_level: str
+
+    @classmethod
+    @functools.cache
+    def load(cls) -> "Config":
+        """Process-wide settings, parsed from the environment on first use."""
+        return cls.from_env()
+
+    @classmethod
+    def from_env(cls) -> "Config":
+        """Parse the environment, falling back to defaults for missing or malformed values."""
+        return cls(
+            brave_api_base=_env_str("BRAVE_API_BASE", "https://api.search.brave.com/res/v1/web/search"),
+            brave_api_key=_env_str("BRAVE_API_KEY", ""),
+            http_timeout_seconds=_env_int("HTTP_TIMEOUT_SECONDS", 12),
+            retry_attempts=_env_int("RETRY_ATTEMPTS", 2),
+            retry_backoff_base_seconds=_env_float("RETRY_BACKOFF_BASE_SECONDS", 0.1),
+            retry_backoff_max_seconds=_env_float("RETRY_BACKOFF_MAX_SECONDS", 5.0),
+            enable_enrichment=_env_bool("ENABLE_ENRICHMENT", True),
+            enable_rerank=_env_bool("ENABLE_RERANK", True),
+            enable_speculative_fanout=_env_bool("ENABLE_SPECULATIVE_FANOUT", False),
+            cache_backend=_env_str("CACHE_BACKEND", "sqlite"),
+            cache_ttl_seconds=_env_int("CACHE_TTL_SECONDS", 600),
+            cache_db_path=_env_str("CACHE_DB_PATH", "search_cache.db"),
+            cache_sweep_interval_seconds=_env_int("CACHE_SWEEP_INTERVAL_SECONDS", 300),
+            memory_cache_size=_env_int("MEMORY_CACHE_SIZE", 1024),
+            extraction_cache_size=_env_int("EXTRACTION_CACHE_SIZE", 256),
+            claude_api_key=_env_str("CLAUDE_API_KEY", ""),
+            mcp_server_url=_env_str("MCP_SERVER_URL", "http://localhost:5001"),
+            port=_env_int("PORT", 5001),
+            log_level=_env_str("LOG_LEVEL", "info").lower(),
+        )
+
+CFG = Config.load()
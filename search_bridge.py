@@ -1,63 +1,153 @@
-import os
 import re
 import json
-import requests
 import time
 import random
 import math
 import sqlite3
-import hashlib
-from typing import Dict, List, Any, Optional, Literal, Protocol
-from dataclasses import dataclass, asdict
-import anthropic
-from requests.adapters import HTTPAdapter
+import weakref
+import functools
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Literal, Protocol, Tuple
+from dataclasses import dataclass
+from hashlib import blake2b
+from itertools import takewhile
+from urllib.parse import urlsplit, parse_qsl, urlencode
 from urllib3.util.retry import Retry
+from config import CFG
 
-# Configuration
-BRAVE_API_BASE = os.environ.get("BRAVE_API_BASE", "https://api.search.brave.com/res/v1/web/search")
-BRAVE_API_KEY = os.environ.get("BRAVE_API_KEY", "")
-HTTP_TIMEOUT_SECONDS = int(os.environ.get("HTTP_TIMEOUT_SECONDS", "12"))
-RETRY_ATTEMPTS = int(os.environ.get("RETRY_ATTEMPTS", "2"))
-RETRY_JITTER_MS = int(os.environ.get("RETRY_JITTER_MS", "200"))
-ENABLE_ENRICHMENT = os.environ.get("ENABLE_ENRICHMENT", "true").lower() == "true"
-ENABLE_RERANK = os.environ.get("ENABLE_RERANK", "true").lower() == "true"
-CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "sqlite")
-CACHE_TTL_SECONDS = int(os.environ.get("CACHE_TTL_SECONDS", "600"))
-CLAUDE_API_KEY = os.environ.get("CLAUDE_API_KEY", "")
+if TYPE_CHECKING:
+    import anthropic
+
+_LOG_LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warn": logging.WARNING,
+    "warning": logging.WARNING,
+    "error": logging.ERROR
+}
+
+# Handlers and levels are left to the application (see server.py)
+logger = logging.getLogger(__name__)
 
 LLMProvider = Literal["claude"]
 
-@dataclass
+# Fenced ```json {...}``` block in an LLM response
+_JSON_BLOCK_RE = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+
+@dataclass(frozen=True, slots=True)
 class WebResult:
     title: str
     url: str
     description: str
 
+    def to_dict(self) -> Dict[str, str]:
+        """Shallow dict for JSON output (much cheaper than dataclasses.asdict)."""
+        return {"title": self.title, "url": self.url, "description": self.description}
+
 class SearchProvider(Protocol):
     def search(self, query: str, count: int = 10) -> List[WebResult]:
         ...
 
+class _EventFields:
+    """Formats key=value pairs only when a handler actually emits the record."""
+    __slots__ = ("fields",)
+
+    def __init__(self, fields: Dict[str, Any]):
+        self.fields = fields
+
+    def __str__(self) -> str:
+        return " | ".join(f"{k}={v}" for k, v in self.fields.items())
+
 def log_search_event(level: str, message: str, **kwargs):
     """Logging for search events."""
-    log_data = {
-        "timestamp": time.time(),
-        "level": level,
-        "message": message,
-        **kwargs
-    }
-    print(f"[{level.upper()}] {message} | " + " | ".join(f"{k}={v}" for k, v in kwargs.items()))
+    log_level = _LOG_LEVELS.get(level, logging.INFO)
+    if logger.isEnabledFor(log_level):
+        logger.log(log_level, "%s | %s", message, _EventFields(kwargs))
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for cache lookups (case and whitespace insensitive)."""
+    return " ".join(query.lower().split())
+
+_TRACKING_PARAMS = frozenset({"gclid", "fbclid", "msclkid", "mc_cid", "mc_eid"})
+
+@functools.lru_cache(maxsize=4096)
+def canonical_url(url: str) -> str:
+    """Canonical form of a URL for deduplication.
+
+    Ignores the scheme, host case, a trailing slash, the fragment and
+    tracking parameters (utm_* and common click ids).
+    """
+    parts = urlsplit(url.strip())
+    params = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in _TRACKING_PARAMS
+    ]
+    canonical = parts.netloc.lower() + parts.path.rstrip("/")
+    if params:
+        canonical += "?" + urlencode(params)
+    return canonical
+
+def parse_json_response(content: str) -> Optional[Dict[str, Any]]:
+    """Parse a JSON object from an LLM response, bare or inside a code fence."""
+    stripped = content.lstrip()
+    if stripped[:1] == "{":
+        try:
+            return json.loads(stripped)
+        except json.JSONDecodeError:
+            pass
+
+    json_match = _JSON_BLOCK_RE.search(content)
+    if json_match:
+        try:
+            return json.loads(json_match.group(1))
+        except json.JSONDecodeError:
+            return None
+    return None
+
+def extracted_queries(result: Optional[Dict[str, Any]]) -> List[str]:
+    """String items of a parsed extraction's "queries" list; any other shape counts as no queries."""
+    queries = result.get("queries") if isinstance(result, dict) else None
+    if not isinstance(queries, list):
+        return []
+    return [query for query in queries if isinstance(query, str)]
+
+class FullJitterRetry(Retry):
+    """Retry policy with full-jitter exponential backoff.
+
+    Sleeps a random duration in [0, min(backoff_max, backoff_factor * 2**n)]
+    so that clients rate limited together do not retry in lockstep. A
+    Retry-After header, when present, still takes precedence.
+    """
+
+    def get_backoff_time(self) -> float:
+        consecutive_errors = len(
+            list(takewhile(lambda x: x.redirect_location is None, reversed(self.history)))
+        )
+        if consecutive_errors == 0:
+            return 0.0
+        ceiling = min(self.backoff_max, self.backoff_factor * (2 ** (consecutive_errors - 1)))
+        return random.uniform(0, ceiling)
 
 def create_session_with_pooling():
+    # Imported here so callers that only enrich or rerank never load requests
+    import requests
+    from requests.adapters import HTTPAdapter
+
     session = requests.Session()
     
     # Configure connection pooling
     adapter = HTTPAdapter(
         pool_connections=10,  # No. of connection pools to cache
         pool_maxsize=20,      # Max num of connections in each pool
-        max_retries=Retry(
-            total=RETRY_ATTEMPTS,
-            backoff_factor=0.5,
-            status_forcelist=[429, 500, 502, 503, 504]
+        max_retries=FullJitterRetry(
+            total=CFG.retry_attempts,
+            backoff_factor=CFG.retry_backoff_base_seconds,
+            backoff_max=CFG.retry_backoff_max_seconds,
+            status_forcelist=[429, 500, 502, 503, 504],
+            respect_retry_after_header=True
         )
     )
     
@@ -66,66 +156,180 @@ def create_session_with_pooling():
     
     return session
 
+# (query, count, enrichment_enabled, reranking_enabled, results)
+CacheEntry = Tuple[str, int, bool, bool, List[WebResult]]
+
 class SearchCache:
-    def __init__(self, ttl_seconds: int = CACHE_TTL_SECONDS):
+    _SCHEMA_VERSION = 4
+    # "sqlite" persists behind the in-process LRU, "memory" keeps only the LRU; anything else disables caching
+    _MEMORY_BACKENDS = frozenset({"sqlite", "memory"})
+
+    # Kept verbatim as constants so the connection's statement cache reuses the prepared statements
+    _SQL_SELECT = (
+        "SELECT results, created_at FROM search_cache WHERE row_key = ? "
+        "AND query_norm = ? AND count = ? AND enrichment_enabled = ? AND reranking_enabled = ?"
+    )
+    _SQL_UPSERT = (
+        "INSERT INTO search_cache "
+        "(row_key, query_norm, count, enrichment_enabled, reranking_enabled, results, created_at, query) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(row_key) DO UPDATE SET "
+        "query_norm = excluded.query_norm, count = excluded.count, "
+        "enrichment_enabled = excluded.enrichment_enabled, reranking_enabled = excluded.reranking_enabled, "
+        "results = excluded.results, created_at = excluded.created_at, query = excluded.query"
+    )
+    _SQL_DELETE_EXPIRED = "DELETE FROM search_cache WHERE created_at < ?"
+
+    def __init__(self, ttl_seconds: int = CFG.cache_ttl_seconds, memory_size: int = CFG.memory_cache_size,
+                 db_path: str = CFG.cache_db_path):
         self.ttl_seconds = ttl_seconds
-        self.db_path = "search_cache.db"
+        self.db_path = db_path
+        # In-process LRU in front of SQLite: key -> (created_at, results)
+        self.memory_size = memory_size
+        self._memory: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._memory_lock = threading.Lock()
+        # One long-lived connection shared by all threads (the server spawns a
+        # thread per request, so per-thread connections would not be reused)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        # Zero so the first write sweeps rows left behind by earlier processes
+        self._last_sweep = 0.0
         self._init_db()
     
+    def _connection(self) -> sqlite3.Connection:
+        """Return the shared connection, opening it on first use. Call with _db_lock held."""
+        if self._conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                check_same_thread=False,
+                isolation_level=None,  # autocommit, no implicit transactions
+                cached_statements=128
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-20000")
+            self._conn = conn
+            # Closes the connection when the cache is collected or at interpreter exit
+            self._close_conn = weakref.finalize(self, conn.close)
+        return self._conn
+
+    def close(self):
+        """Close the shared SQLite connection."""
+        with self._db_lock:
+            if self._conn is not None:
+                self._close_conn()
+                self._conn = None
+
     def _init_db(self):
         """Initialize the SQLite database and tables."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._db_lock:
+                conn = self._connection()
+                # Cached rows are disposable, so an outdated layout is simply rebuilt
+                if conn.execute("PRAGMA user_version").fetchone()[0] != self._SCHEMA_VERSION:
+                    conn.execute("DROP TABLE IF EXISTS search_cache")
+                    conn.execute(f"PRAGMA user_version = {self._SCHEMA_VERSION}")
                 conn.execute("""
                     CREATE TABLE IF NOT EXISTS search_cache (
-                        cache_key TEXT PRIMARY KEY,
-                        results TEXT NOT NULL,
-                        created_at REAL NOT NULL,
-                        query TEXT NOT NULL,
+                        row_key INTEGER PRIMARY KEY,
+                        query_norm TEXT NOT NULL,
                         count INTEGER NOT NULL,
-                        enrichment_enabled BOOLEAN NOT NULL,
-                        reranking_enabled BOOLEAN NOT NULL
+                        enrichment_enabled INTEGER NOT NULL,
+                        reranking_enabled INTEGER NOT NULL,
+                        results BLOB NOT NULL,
+                        created_at REAL NOT NULL,
+                        query TEXT NOT NULL
                     )
                 """)
-                conn.commit()
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_search_cache_created_at ON search_cache(created_at)"
+                )
         except Exception as e:
             log_search_event("error", "Failed to initialize cache", error=str(e))
     
-    def _generate_cache_key(self, query: str, count: int, enrichment_enabled: bool, reranking_enabled: bool) -> str:
-        """Generate a cache key using hashing."""
-        key_data = f"{query.lower().strip()}:{count}:{int(enrichment_enabled)}:{int(reranking_enabled)}"
-        return hashlib.sha256(key_data.encode('utf-8')).hexdigest()[:16]  #for efficiency?
+    def _sweep_expired(self, now: float):
+        """Delete every expired row in one statement. Call with _db_lock held."""
+        self._last_sweep = now
+        deleted = self._connection().execute(
+            self._SQL_DELETE_EXPIRED, (now - self.ttl_seconds,)
+        ).rowcount
+        if deleted:
+            log_search_event("info", "Cache swept", expired_rows=deleted)
+
+    def _memory_get(self, key: tuple) -> Optional[List[WebResult]]:
+        """Return results from the in-process LRU if present and fresh."""
+        with self._memory_lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            created_at, results = entry
+            if time.time() - created_at >= self.ttl_seconds:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return list(results)
+
+    def _memory_set(self, key: tuple, created_at: float, results: List[WebResult]):
+        """Store results in the in-process LRU, evicting the oldest entries."""
+        if self.memory_size <= 0:
+            return
+        with self._memory_lock:
+            self._memory[key] = (created_at, list(results))
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _cache_key(self, query: str, count: int, enrichment_enabled: bool, reranking_enabled: bool) -> tuple:
+        """Key shared by the memory layer and the SQLite lookup."""
+        return (normalize_query(query), count, int(enrichment_enabled), int(reranking_enabled))
+
+    @staticmethod
+    def _row_key(cache_key: tuple) -> int:
+        """64-bit id for a cache key, stored as the table's rowid."""
+        key_data = "\x1f".join(map(str, cache_key)).encode("utf-8")
+        return int.from_bytes(blake2b(key_data, digest_size=8).digest(), "big", signed=True)
     
     def get(self, query: str, count: int, enrichment_enabled: bool, reranking_enabled: bool) -> Optional[List[WebResult]]:
         """Retrieve cached results if they exist and are not expired."""
-        if CACHE_BACKEND != "sqlite":
+        if CFG.cache_backend not in self._MEMORY_BACKENDS:
+            log_search_event("info", "Cache miss", query=query)
+            return None
+
+        cache_key = self._cache_key(query, count, enrichment_enabled, reranking_enabled)
+        web_results = self._memory_get(cache_key)
+        if web_results is not None:
+            if logger.isEnabledFor(logging.INFO):
+                log_search_event("info", "Cache hit", query=query, layer="memory")
+            return web_results
+
+        if CFG.cache_backend != "sqlite":
+            log_search_event("info", "Cache miss", query=query)
             return None
             
         try:
-            cache_key = self._generate_cache_key(query, count, enrichment_enabled, reranking_enabled)
-            
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute(
-                    "SELECT results, created_at FROM search_cache WHERE cache_key = ?",
-                    (cache_key,)
-                )
-                row = cursor.fetchone()
+            with self._db_lock:
+                conn = self._connection()
+                row = conn.execute(
+                    self._SQL_SELECT,
+                    (self._row_key(cache_key), *cache_key)
+                ).fetchone()
                 
                 if row:
                     results_json, created_at = row
                     age_seconds = time.time() - created_at
                     
                     if age_seconds < self.ttl_seconds:
-                        results = json.loads(results_json)
-                        web_results = [WebResult(**result) for result in results]
-                        log_search_event("info", "Cache hit", query=query, age_seconds=int(age_seconds))
+                        web_results = [WebResult(*item) for item in json.loads(results_json)]
+                        # Promote to the memory layer, keeping the original age for TTL
+                        self._memory_set(cache_key, created_at, web_results)
+                        log_search_event("info", "Cache hit", query=query, layer="sqlite", age_seconds=int(age_seconds))
                         return web_results
                     else:
-                        # Expired, remove from cache
-                        conn.execute("DELETE FROM search_cache WHERE cache_key = ?", (cache_key,))
-                        conn.commit()
+                        # Expired rows are left for _sweep_expired to keep writes off the read path
                         log_search_event("info", "Cache expired", query=query, age_seconds=int(age_seconds))
             
+            log_search_event("info", "Cache miss", query=query)
             return None
             
         except Exception as e:
@@ -134,95 +338,140 @@ class SearchCache:
     
     def set(self, query: str, count: int, enrichment_enabled: bool, reranking_enabled: bool, results: List[WebResult]):
         """Store results in cache."""
-        if CACHE_BACKEND != "sqlite":
+        self.set_many([(query, count, enrichment_enabled, reranking_enabled, results)])
+
+    def set_many(self, entries: List[CacheEntry]):
+        """Store several (query, count, enrichment_enabled, reranking_enabled, results) entries in one transaction."""
+        if CFG.cache_backend not in self._MEMORY_BACKENDS:
             return
-            
+
+        created_at = time.time()
+        rows = []
         try:
-            cache_key = self._generate_cache_key(query, count, enrichment_enabled, reranking_enabled)
-            results_json = json.dumps([asdict(result) for result in results])
-            created_at = time.time()
-            
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    INSERT OR REPLACE INTO search_cache 
-                    (cache_key, results, created_at, query, count, enrichment_enabled, reranking_enabled)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (cache_key, results_json, created_at, query, count, enrichment_enabled, reranking_enabled))
-                conn.commit()
+            memory_entries = []
+            for query, count, enrichment_enabled, reranking_enabled, results in entries:
+                cache_key = self._cache_key(query, count, enrichment_enabled, reranking_enabled)
+                # Compact [title, url, description] rows stored as UTF-8 bytes
+                results_json = json.dumps(
+                    [[result.title, result.url, result.description] for result in results],
+                    separators=(",", ":")
+                ).encode("utf-8")
+                rows.append((self._row_key(cache_key), *cache_key, results_json, created_at, query))
+                memory_entries.append((cache_key, results))
+
+            # Only entries that all encoded reach the memory layer
+            for cache_key, results in memory_entries:
+                self._memory_set(cache_key, created_at, results)
+
+            if CFG.cache_backend != "sqlite" or not rows:
+                return
+
+            with self._db_lock:
+                conn = self._connection()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany(self._SQL_UPSERT, rows)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                if created_at - self._last_sweep >= CFG.cache_sweep_interval_seconds:
+                    self._sweep_expired(created_at)
                 
-            log_search_event("info", "Results cached", query=query, results_count=len(results))
+            log_search_event("info", "Results cached", entries=len(rows),
+                             results_count=sum(len(entry[4]) for entry in entries))
             
         except Exception as e:
-            log_search_event("error", "Cache storage failed", query=query, error=str(e))
+            log_search_event("error", "Cache storage failed", entries=len(entries), error=str(e))
+
+# Simple typo corrections
+_TYPO_MAP = {
+    "teh": "the",
+    "recieve": "receive",
+    "seperate": "separate",
+    "occured": "occurred",
+    "neccessary": "necessary"
+}
+
+_SYNONYM_MAP = {
+    "fast": ["quick", "rapid"],
+    "big": ["large", "huge"],
+    "good": ["great", "excellent"],
+    "bad": ["poor", "terrible"]
+}
+
+_TYPO_RE = re.compile(r"\b(?:" + "|".join(map(re.escape, _TYPO_MAP)) + r")\b")
+_SYNONYM_RE = re.compile(r"\b(?:" + "|".join(map(re.escape, _SYNONYM_MAP)) + r")\b")
+_SYNONYM_WORD_RES = {word: re.compile(r"\b" + re.escape(word) + r"\b") for word in _SYNONYM_MAP}
 
 def enrich_query(query: str) -> List[str]:
     """Apply simple query enrichment: typo fixes and synonyms."""
-    if not ENABLE_ENRICHMENT:
+    if not CFG.enable_enrichment:
         return [query]
-    
+    return list(_enrich_cached(query))
+
+@functools.lru_cache(maxsize=2048)
+def _enrich_cached(query: str) -> tuple:
+    """Enrichment variants for a query; pure given the static rule tables."""
+    lowered = query.lower()
+    corrected = _TYPO_RE.sub(lambda m: _TYPO_MAP[m.group()], lowered)
+    synonym_words = {m.group() for m in _SYNONYM_RE.finditer(lowered)}
+    if corrected == lowered and not synonym_words:
+        return (query,)
+
     enriched = [query]
     
-    # Simple typo corrections
-    typos = {
-        "teh": "the",
-        "recieve": "receive",
-        "seperate": "separate",
-        "occured": "occurred",
-        "neccessary": "necessary"
-    }
-    
-    for typo, correction in typos.items():
-        if typo in query.lower():
-            corrected = query.lower().replace(typo, correction)
-            if corrected not in enriched:
-                enriched.append(corrected)
+    # All typos are fixed in a single variant
+    if corrected != lowered and corrected not in enriched:
+        enriched.append(corrected)
     
-
-    synonyms = {
-        "fast": ["quick", "rapid"],
-        "big": ["large", "huge"],
-        "good": ["great", "excellent"],
-        "bad": ["poor", "terrible"]
-    }
-    
-    for word, syns in synonyms.items():
-        if word in query.lower() and len(enriched) < 3:  # Cap at 3 variants
+    for word, syns in _SYNONYM_MAP.items():
+        if word in synonym_words and len(enriched) < 3:  # Cap at 3 variants
             for syn in syns:
                 if len(enriched) < 3:
-                    variant = query.lower().replace(word, syn)
+                    variant = _SYNONYM_WORD_RES[word].sub(syn, lowered)
                     if variant not in enriched:
                         enriched.append(variant)
     
-    return enriched[:3]  
+    return tuple(enriched[:3])
+
+# Only the start of a snippet is scored; bounds per-result work for long descriptions
+RERANK_DESCRIPTION_CHARS = 256
+
+@functools.lru_cache(maxsize=4096)
+def _result_terms(title: str, description: str) -> tuple:
+    """Lower-cased text plus title and text token sets for a result, reused across queries."""
+    title_lower = title.lower()
+    text = f"{title_lower} {description[:RERANK_DESCRIPTION_CHARS].lower()}"
+    return text, frozenset(title_lower.split()), frozenset(text.split())
 
 def rerank_results(query: str, results: List[WebResult]) -> List[WebResult]:
-    """Apply reranking using TF-IDF style scoring."""
-    if not ENABLE_RERANK or len(results) <= 1:
+    """Apply reranking using TF-IDF scoring over the result set."""
+    if not CFG.enable_rerank or len(results) <= 1:
         return results
     
-    query_terms = set(query.lower().split())
+    # Query-side work is done once, not per result
+    query_lower = query.lower()
+    query_terms = frozenset(query_lower.split())
+    result_terms = [_result_terms(result.title, result.description) for result in results]
     
-    def calculate_score(result: WebResult) -> float:
+    # Smoothed IDF over this result set, so terms that appear everywhere count for less
+    doc_count = len(results)
+    idf = {}
+    for term in query_terms:
+        doc_freq = sum(1 for _, _, text_terms in result_terms if term in text_terms)
+        idf[term] = math.log((1 + doc_count) / (1 + doc_freq)) + 1.0
+    
+    def calculate_score(result: WebResult, terms: tuple) -> float:
         # Combine title and description for scoring
-        text = f"{result.title} {result.description}".lower()
-        text_terms = text.split()
-        
-        # Simple TF-IDF scoring
-        score = 0.0
-        
-        # Title matches get higher weight
-        title_terms = result.title.lower().split()
-        for term in query_terms:
-            if term in title_terms:
-                score += 2.0  # Title matches are more important
+        text, title_terms, text_terms = terms
         
-        # Description matches
-        for term in query_terms:
-            if term in text_terms:
-                score += 1.0
+        # Title matches count double, description matches once, each weighted by IDF
+        score = 2.0 * sum(idf[term] for term in query_terms & title_terms)
+        score += sum(idf[term] for term in query_terms & text_terms)
         
         # Boost for exact phrase matches
-        if query.lower() in text:
+        if query_lower in text:
             score += 3.0
         
         # Penalty for very short descriptions
@@ -232,39 +481,50 @@ def rerank_results(query: str, results: List[WebResult]) -> List[WebResult]:
         return score
     
     # Score and sort results
-    scored_results = [(result, calculate_score(result)) for result in results]
+    scored_results = [(result, calculate_score(result, terms)) for result, terms in zip(results, result_terms)]
     scored_results.sort(key=lambda x: x[1], reverse=True)
     
     # Return results in new order, preserving original as tie-breaker
     reranked = [result for result, _ in scored_results]
     
     log_search_event("info", "Results reranked", query=query, 
-                    results_count=len(reranked), reranking_enabled=ENABLE_RERANK)
+                    results_count=len(reranked), reranking_enabled=CFG.enable_rerank)
     
     return reranked
 
 class BraveSearchProvider:
-    def __init__(self, api_base: str = BRAVE_API_BASE, api_key: str = BRAVE_API_KEY):
+    def __init__(self, api_base: str = CFG.brave_api_base, api_key: str = CFG.brave_api_key,
+                 cache: Optional[SearchCache] = None):
         self.api_base = api_base
         self.api_key = api_key
-        self.timeout = HTTP_TIMEOUT_SECONDS
-        self.max_retries = RETRY_ATTEMPTS
-        self.jitter_ms = RETRY_JITTER_MS
-        self.cache = SearchCache()
+        self.timeout = CFG.http_timeout_seconds
+        self.cache = cache if cache is not None else SearchCache()
         self.session = create_session_with_pooling()
+        # Runs the extra enriched variants (enrich_query caps at 3 in total)
+        self.executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="brave-search")
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip",
+            "X-Subscription-Token": self.api_key
+        })
 
     def search(self, query: str, count: int = 10) -> List[WebResult]:
+        query = query.strip()
+        if not query:
+            log_search_event("warn", "Empty query", engine="brave")
+            return []
+
         if not self.api_key:
             log_search_event("error", "Missing API key", engine="brave")
             return []
 
-        start_time = time.time()
+        start_time = time.monotonic()
         log_search_event("info", "Starting search", engine="brave", query=query, max_results=count)
 
         # Check cache first
-        cached_results = self.cache.get(query, count, ENABLE_ENRICHMENT, ENABLE_RERANK)
+        cached_results = self.cache.get(query, count, CFG.enable_enrichment, CFG.enable_rerank)
         if cached_results:
-            latency_ms = int((time.time() - start_time) * 1000)
+            latency_ms = int((time.monotonic() - start_time) * 1000)
             log_search_event("info", "Search completed from cache", engine="brave", query=query, 
                            results_count=len(cached_results), latency_ms=latency_ms)
             return cached_results
@@ -273,47 +533,57 @@ class BraveSearchProvider:
         if len(enriched_queries) > 1:
             log_search_event("info", "Query enriched", original=query, variants=len(enriched_queries))
 
-        all_results = []
-        for enriched_query in enriched_queries:
-            try:
-                results = self._perform_search(enriched_query, count)
-                all_results.extend(results)
-                if len(all_results) >= count:
-                    break
-            except Exception as e:
-                log_search_event("warn", "Enriched query failed", query=enriched_query, error=str(e))
-                continue
-
-        # Deduplicate results by URL
-        seen_urls = set()
-        unique_results = []
-        for result in all_results:
-            if result.url not in seen_urls:
-                seen_urls.add(result.url)
-                unique_results.append(result)
-                if len(unique_results) >= count:
+        # Deduplicate by URL while collecting, merging in input order
+        seen: Dict[str, WebResult] = {}
+        variants = enriched_queries[1:]
+
+        def submit_variants() -> List[Future]:
+            return [self.executor.submit(self._perform_search, variant, count) for variant in variants]
+
+        # Variants are only searched speculatively when configured; by default
+        # they run (in parallel) only if the original query comes up short
+        futures = submit_variants() if CFG.enable_speculative_fanout else []
+
+        # The original query runs on this thread, so it never pays for a thread hop
+        try:
+            for result in self._perform_search(query, count):
+                seen.setdefault(canonical_url(result.url), result)
+        except Exception as e:
+            log_search_event("warn", "Enriched query failed", query=query, error=str(e))
+
+        if variants and len(seen) < count:
+            futures = futures or submit_variants()
+            for variant, future in zip(variants, futures):
+                try:
+                    results = future.result()
+                except Exception as e:
+                    log_search_event("warn", "Enriched query failed", query=variant, error=str(e))
+                    continue
+                for result in results:
+                    seen.setdefault(canonical_url(result.url), result)
+                if len(seen) >= count:
                     break
 
+        for future in futures:
+            future.cancel()
+
+        unique_results = list(seen.values())[:count]
+
         # Apply reranking
         if len(unique_results) > 1:
             unique_results = rerank_results(query, unique_results)
 
         # Cache the results
-        self.cache.set(query, count, ENABLE_ENRICHMENT, ENABLE_RERANK, unique_results)
+        self.cache.set(query, count, CFG.enable_enrichment, CFG.enable_rerank, unique_results)
 
-        latency_ms = int((time.time() - start_time) * 1000)
+        latency_ms = int((time.monotonic() - start_time) * 1000)
         log_search_event("info", "Search completed", engine="brave", query=query, 
                        results_count=len(unique_results), latency_ms=latency_ms, 
-                       enrichment_enabled=ENABLE_ENRICHMENT, reranking_enabled=ENABLE_RERANK)
+                       enrichment_enabled=CFG.enable_enrichment, reranking_enabled=CFG.enable_rerank)
         
         return unique_results[:count]
 
     def _perform_search(self, query: str, count: int) -> List[WebResult]:
-        headers = {
-            "Accept": "application/json",
-            "X-Subscription-Token": self.api_key
-        }
-        
         params = {
             "q": query,
             "count": min(count, 10)  # Brave API limit
@@ -321,52 +591,49 @@ class BraveSearchProvider:
 
         response = self.session.get(
             self.api_base,
-            headers=headers,
             params=params,
             timeout=self.timeout
         )
 
         response.raise_for_status()
-        data = response.json()
-        results = []
-
-        if "web" in data and "results" in data["web"]:
-            for item in data["web"]["results"][:count]:
-                results.append(WebResult(
-                    title=item.get("title", ""),
-                    url=item.get("url", ""),
-                    description=item.get("description", "")
-                ))
-        
-        return results
+        # Parse the raw bytes: skips requests' text decoding and charset sniffing
+        data = json.loads(response.content)
+        items = data.get("web", {}).get("results", [])[:count]
 
-    def _should_retry(self, error: Exception) -> bool:
-        """Determine if the error is retryable."""
-        if hasattr(error, 'response') and error.response is not None:
-            status_code = error.response.status_code
-            return status_code >= 500 or status_code == 429
-        return False
-
-    def _wait_with_jitter(self, attempt: int):
-        """Wait with exponential backoff and jitter."""
-        base_delay = 2 ** attempt
-        jitter = random.randint(0, self.jitter_ms) / 1000.0
-        delay = base_delay + jitter
-        time.sleep(delay)
+        # Fixed three-field schema: build results positionally in one pass
+        return [
+            WebResult(item.get("title", ""), item.get("url", ""), item.get("description", ""))
+            for item in items
+        ]
 
+@functools.lru_cache(maxsize=1)
 def get_search_provider() -> SearchProvider:
-    """Factory function to get the configured search provider."""
+    """Factory function to get the configured search provider.
+
+    The provider is shared process-wide so its pooled session keeps
+    connections to the search API alive across tool calls.
+    """
     return BraveSearchProvider()
 
+@functools.lru_cache(maxsize=1)
+def _get_anthropic_client() -> "anthropic.Anthropic":
+    """Process-wide Anthropic client so its HTTP connection pool is reused."""
+    # Imported lazily: anthropic pulls in httpx and pydantic, which search-only paths never need
+    import anthropic
+    return anthropic.Anthropic(api_key=CFG.claude_api_key)
+
 class ClaudeMCPBridge:
     def __init__(self, llm_provider: LLMProvider = "claude"):
         self.search_provider = get_search_provider()
         self.llm_provider = llm_provider
+        # Normalized user message -> extracted queries, most recent last
+        self._extraction_cache: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._extraction_lock = threading.Lock()
 
         if llm_provider == "claude":
-            if not CLAUDE_API_KEY:
+            if not CFG.claude_api_key:
                 raise ValueError("Missing CLAUDE_API_KEY. Set it in your environment.")
-            self.claude_client = anthropic.Anthropic(api_key=CLAUDE_API_KEY)
+            self.claude_client = _get_anthropic_client()
 
     def extract_website_queries_with_llm(self, user_message: str) -> List[str]:
         if self.llm_provider == "claude":
@@ -374,44 +641,72 @@ class ClaudeMCPBridge:
         else:
             return ["error"]
         
+    def _extraction_request(self, user_message: str) -> Dict[str, Any]:
+        """Arguments for the Claude query-extraction call."""
+        return {
+            "model": "claude-3-sonnet-20240229",
+            "max_tokens": 1000,
+            "temperature": 0.1,
+            "system": "You are a helpful assistant that identifies web search queries in user message. Extract any specific website or topic queries the user wants information about. Return results as a JSON object with a 'queries' field containing an array of strings. If no queries are found, return an empty array.",
+            "messages": [
+                {"role": "user", "content": user_message}
+            ]
+        }
+
     def _extract_with_claude(self, user_message: str) -> List[str]:
+        cache_key = normalize_query(user_message)
+        queries = self._cached_extraction(cache_key)
+        if queries is not None:
+            return queries
+
         try:
-            response = self.claude_client.messages.create(
-                model="claude-3-sonnet-20240229",
-                max_tokens=1000,
-                temperature=0.1,
-                system="You are a helpful assistant that identifies web search queries in user message. Extract any specific website or topic queries the user wants information about. Return results as a JSON object with a 'queries' field containing an array of strings. If no queries are found, return an empty array.",
-                messages=[
-                    {"role": "user", "content": user_message}
-                ]
-            )
+            response = self.claude_client.messages.create(**self._extraction_request(user_message))
 
             content = response.content[0].text
-            json_match = re.search(r'```(?:json)?\s*({.*?})\s*```', content, re.DOTALL)
-            if json_match:
-                result = json.loads(json_match.group(1))
-            else:
-                try:
-                    result = json.loads(content)
-                except:
-                    return []
-            queries = result.get("queries", [])
+            result = parse_json_response(content)
+            if result is None:
+                return []
+            queries = extracted_queries(result)
+            self._remember_extraction(cache_key, queries)
             return queries
         
         except Exception as e:
-            print(f"Error extracting queries with Claude: {e}")
+            log_search_event("error", "Claude extraction failed", error=str(e))
             return []
+
+    def _cached_extraction(self, cache_key: str) -> Optional[List[str]]:
+        """Return previously extracted queries for a normalized message, if any."""
+        with self._extraction_lock:
+            if cache_key not in self._extraction_cache:
+                return None
+            self._extraction_cache.move_to_end(cache_key)
+            log_search_event("info", "Extraction cache hit", user_message=cache_key)
+            return list(self._extraction_cache[cache_key])
+
+    def _remember_extraction(self, cache_key: str, queries: List[str]):
+        """Cache extracted queries, evicting the least recently used message."""
+        if CFG.extraction_cache_size <= 0:
+            return
+        with self._extraction_lock:
+            self._extraction_cache[cache_key] = list(queries)
+            self._extraction_cache.move_to_end(cache_key)
+            while len(self._extraction_cache) > CFG.extraction_cache_size:
+                self._extraction_cache.popitem(last=False)
         
+@functools.lru_cache(maxsize=None)
+def get_claude_bridge(llm_provider: LLMProvider = "claude") -> ClaudeMCPBridge:
+    """Return the shared bridge for the given LLM provider."""
+    return ClaudeMCPBridge(llm_provider)
+
 def handle_claude_tool_call(tool_params: Dict[str, Any]) -> Dict[str, Any]:
     query = tool_params.get("query", "")
-    if not query:
+    if not isinstance(query, str) or not query.strip():
         return {"error": "Missing query parameter"}
     
-    bridge = ClaudeMCPBridge()
-    results = bridge.search_provider.search(query)
+    results = get_search_provider().search(query)
 
     return {
-        "results": [asdict(result) for result in results]
+        "results": [result.to_dict() for result in results]
     }
     
 
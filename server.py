@@ -1,12 +1,12 @@
-import os
-import json
+import sys
+import logging
 from flask import Flask, request, jsonify
-from search_bridge import ClaudeMCPBridge, handle_claude_tool_call
+from config import CFG
+from search_bridge import get_claude_bridge, handle_claude_tool_call
 
-PORT = int(os.environ.get("PORT", 5001))
 
 app = Flask(__name__)
-bridge = ClaudeMCPBridge()
+bridge = get_claude_bridge()
 
 @app.route("/health", methods=["GET"])
 def health_check():
@@ -38,4 +38,9 @@ def tool_call():
     return jsonify(result)
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=PORT)
\ No newline at end of file
+    logging.basicConfig(
+        level=getattr(logging, CFG.log_level.upper(), logging.INFO),
+        format="[%(levelname)s] %(message)s",
+        stream=sys.stdout
+    )
+    app.run(host="0.0.0.0", port=CFG.port)
\ No newline at end of file
@@ -1,7 +1,23 @@
+import gc
 import os
+import logging
+import sqlite3
+import time
 import pytest
+from dataclasses import replace
 from unittest.mock import Mock, patch
-from search_bridge import WebResult, enrich_query, rerank_results, SearchCache
+from config import CFG, Config
+from search_bridge import WebResult, enrich_query, rerank_results, SearchCache, BraveSearchProvider, ClaudeMCPBridge, get_search_provider, parse_json_response, FullJitterRetry, handle_claude_tool_call, canonical_url
+
+def test_config_falls_back_on_bad_values():
+    """Test that malformed environment values fall back to defaults."""
+    env = {"HTTP_TIMEOUT_SECONDS": "soon", "ENABLE_RERANK": "False", "RETRY_BACKOFF_MAX_SECONDS": "2.5"}
+    with patch.dict(os.environ, env):
+        config = Config.from_env()
+    assert config.http_timeout_seconds == 12
+    assert config.enable_rerank is False
+    assert config.retry_backoff_max_seconds == 2.5
+    assert Config.load() is CFG
 
 def test_web_result():
     """Test WebResult dataclass creation."""
@@ -13,52 +29,318 @@ def test_web_result():
     assert result.title == "Test Title"
     assert result.url == "https://example.com"
     assert result.description == "Test description"
+    assert result.to_dict() == {
+        "title": "Test Title",
+        "url": "https://example.com",
+        "description": "Test description"
+    }
 
 def test_enrich_query_disabled():
     """Test query enrichment when disabled."""
-    os.environ["ENABLE_ENRICHMENT"] = "false"
-    queries = enrich_query("test query")
-    assert queries == ["test query"]
+    with patch("search_bridge.CFG", replace(CFG, enable_enrichment=False)):
+        queries = enrich_query("teh fast car")
+    assert queries == ["teh fast car"]
 
 def test_enrich_query_typo_correction():
     """Test typo correction in query enrichment."""
-    os.environ["ENABLE_ENRICHMENT"] = "true"
-    queries = enrich_query("teh test")
+    with patch("search_bridge.CFG", replace(CFG, enable_enrichment=True)):
+        queries = enrich_query("teh test")
     assert "the test" in queries
     assert "teh test" in queries
 
 def test_enrich_query_synonym_expansion():
     """Test synonym expansion in query enrichment."""
-    os.environ["ENABLE_ENRICHMENT"] = "true"
-    queries = enrich_query("fast car")
+    with patch("search_bridge.CFG", replace(CFG, enable_enrichment=True)):
+        queries = enrich_query("fast car")
     assert "fast car" in queries
     assert "quick car" in queries or "rapid car" in queries
 
+def test_enrich_query_matches_whole_words_only():
+    """Test that enrichment ignores trigger words embedded in other words."""
+    assert enrich_query("breakfast ideas") == ["breakfast ideas"]
+
+def test_enrich_query_fixes_all_typos_in_one_variant():
+    """Test that several typos are corrected together, leaving room for synonyms."""
+    with patch("search_bridge.CFG", replace(CFG, enable_enrichment=True)):
+        queries = enrich_query("teh seperate fast car")
+    assert queries == ["teh seperate fast car", "the separate fast car", "teh seperate quick car"]
+
 def test_rerank_results_disabled():
     """Test reranking when disabled."""
-    os.environ["ENABLE_RERANK"] = "false"
     results = [
         WebResult("Title 1", "https://1.com", "Description 1"),
-        WebResult("Title 2", "https://2.com", "Description 2")
+        WebResult("Test Title 2", "https://2.com", "Test description 2")
     ]
-    reranked = rerank_results("test", results)
+    with patch("search_bridge.CFG", replace(CFG, enable_rerank=False)):
+        reranked = rerank_results("test", results)
     assert len(reranked) == 2
+    assert reranked == results
 
 def test_rerank_results_scoring():
     """Test that reranking properly scores and sorts results."""
-    os.environ["ENABLE_RERANK"] = "true"
     results = [
         WebResult("Generic Title", "https://1.com", "Generic description"),
         WebResult("Test Title", "https://2.com", "Test description with test word")
     ]
-    reranked = rerank_results("test", results)
+    with patch("search_bridge.CFG", replace(CFG, enable_rerank=True)):
+        reranked = rerank_results("test", results)
     # The second result should be ranked higher due to "test" matches
     assert reranked[0].title == "Test Title"
 
-def test_cache_initialization():
+def test_blank_queries_skip_the_network():
+    """Test that empty or whitespace-only queries are rejected up front."""
+    provider = BraveSearchProvider(api_key="test-key", cache=Mock())
+    with patch.object(provider, "_perform_search") as perform:
+        assert provider.search("   ") == []
+    perform.assert_not_called()
+    assert handle_claude_tool_call({"query": " \n"}) == {"error": "Missing query parameter"}
+    assert handle_claude_tool_call({"query": {}}) == {"error": "Missing query parameter"}
+
+def test_perform_search_parses_brave_response():
+    """Test extraction of results from a Brave API response body."""
+    provider = BraveSearchProvider(api_key="test-key", cache=Mock())
+    body = b'{"web": {"results": [{"title": "A", "url": "https://a.com", "description": "First"}, {"url": "https://b.com"}]}}'
+    provider.session = Mock()
+    provider.session.get.return_value = Mock(content=body)
+
+    assert provider._perform_search("query", 5) == [
+        WebResult("A", "https://a.com", "First"),
+        WebResult("", "https://b.com", "")
+    ]
+    provider.session.get.return_value = Mock(content=b'{"query": {}}')
+    assert provider._perform_search("query", 5) == []
+
+def test_rerank_results_weights_rare_terms():
+    """Test that a query term shared by every result counts less than a rare one."""
+    padding = " with enough descriptive text to avoid the short penalty"
+    results = [
+        WebResult("Basics", "https://1.com", "A tutorial" + padding),
+        WebResult("Guide", "https://2.com", "Some python" + padding),
+        WebResult("Index", "https://3.com", "Every tutorial" + padding)
+    ]
+    with patch("search_bridge.CFG", replace(CFG, enable_rerank=True)):
+        reranked = rerank_results("python tutorial", results)
+    assert reranked[0].url == "https://2.com"
+
+def test_rerank_ignores_text_past_description_window():
+    """Test that only the first RERANK_DESCRIPTION_CHARS of a description are scored."""
+    results = [
+        WebResult("First", "https://1.com", "x " * 200 + "needle"),
+        WebResult("Second", "https://2.com", "needle " + "y " * 50)
+    ]
+    with patch("search_bridge.CFG", replace(CFG, enable_rerank=True)):
+        reranked = rerank_results("needle", results)
+    assert reranked[0].url == "https://2.com"
+
+def test_cache_initialization(tmp_path):
     """Test cache initialization."""
-    cache = SearchCache(ttl_seconds=300)
+    cache = SearchCache(ttl_seconds=300, db_path=str(tmp_path / "cache.db"))
     assert cache.ttl_seconds == 300
 
+def test_cache_memory_layer(tmp_path):
+    """Test the in-process cache layer: normalization, TTL and LRU eviction."""
+    cache = SearchCache(ttl_seconds=300, memory_size=1, db_path=str(tmp_path / "cache.db"))
+    results = [WebResult("Title", "https://example.com", "Description")]
+    cache.set("Memory  Test ", 5, True, True, results)
+    assert cache._memory_get(("memory test", 5, True, True)) == results
+    assert cache.get("memory test", 5, True, True) == results
+
+    cache._memory_set(("other query", 5, True, True), time.time() - 301, results)
+    assert cache._memory_get(("memory test", 5, True, True)) is None
+    assert cache._memory_get(("other query", 5, True, True)) is None
+
+def test_cache_backend_selection(tmp_path):
+    """Test that "memory" skips SQLite and any other non-sqlite backend disables caching."""
+    results = [WebResult("Title", "https://example.com", "Description")]
+    cache = SearchCache(ttl_seconds=300, db_path=str(tmp_path / "cache.db"))
+    with patch("search_bridge.CFG", replace(CFG, cache_backend="memory")):
+        cache.set("backend test", 5, True, True, results)
+        assert cache.get("backend test", 5, True, True) == results
+    assert cache._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0] == 0
+
+    cache = SearchCache(ttl_seconds=300, db_path=str(tmp_path / "cache.db"))
+    with patch("search_bridge.CFG", replace(CFG, cache_backend="none")):
+        cache.set("backend test", 5, True, True, results)
+        assert cache.get("backend test", 5, True, True) is None
+        assert cache.get("backend test", 5, True, True) is None
+
+def test_search_events_reach_application_logging(tmp_path, caplog):
+    """Test that search events propagate to handlers configured by the application."""
+    cache = SearchCache(ttl_seconds=300, db_path=str(tmp_path / "cache.db"))
+    with caplog.at_level(logging.INFO, logger="search_bridge"):
+        cache.get("logging test", 5, True, True)
+    assert any(record.getMessage().startswith("Cache miss") for record in caplog.records)
+
+def test_search_provider_is_shared():
+    """Test that the search provider and its session are reused."""
+    get_search_provider.cache_clear()
+    try:
+        with patch("search_bridge.SearchCache"):
+            provider = get_search_provider()
+        assert get_search_provider() is provider
+        assert provider.session.headers["Accept"] == "application/json"
+        assert provider.session.headers["Accept-Encoding"] == "gzip"
+    finally:
+        get_search_provider.cache_clear()
+
+def test_search_fans_out_enriched_queries():
+    """Test that enriched variants are searched and a failing one is skipped."""
+    def fake_search(query, count):
+        if query == "rapid car":
+            raise RuntimeError("boom")
+        return [WebResult(query, f"https://{query.split()[0]}.com", "car " * 20)]
+
+    provider = BraveSearchProvider(api_key="test-key", cache=Mock(get=Mock(return_value=None)))
+    with patch("search_bridge.CFG", replace(CFG, enable_enrichment=True)), \
+         patch.object(provider, "_perform_search", side_effect=fake_search) as perform:
+        results = provider.search("fast car", count=5)
+    assert perform.call_count == 3
+    assert {r.url for r in results} == {"https://fast.com", "https://quick.com"}
+
+def test_search_skips_variants_when_original_fills_results():
+    """Test that enriched variants are not searched once the original query fills the count."""
+    def fake_search(query, count):
+        return [WebResult(query, f"https://{n}.com", "car " * 20) for n in range(count)]
+
+    provider = BraveSearchProvider(api_key="test-key", cache=Mock(get=Mock(return_value=None)))
+    with patch("search_bridge.CFG", replace(CFG, enable_enrichment=True, enable_speculative_fanout=False)), \
+         patch.object(provider, "_perform_search", side_effect=fake_search) as perform:
+        results = provider.search("fast car", count=3)
+    perform.assert_called_once_with("fast car", 3)
+    assert len(results) == 3
+
+def _make_bridge() -> ClaudeMCPBridge:
+    """Bridge with a test API key and a mocked search provider (no cache file on disk)."""
+    with patch("search_bridge.CFG", replace(CFG, claude_api_key="test-key")), \
+         patch("search_bridge.get_search_provider"):
+        return ClaudeMCPBridge()
+
+def test_extraction_is_cached_per_message():
+    """Test that repeated user messages skip the Claude extraction call."""
+    bridge = _make_bridge()
+    bridge.claude_client = Mock()
+    bridge.claude_client.messages.create.return_value = Mock(content=[Mock(text='{"queries": ["ai news"]}')])
+
+    assert bridge.extract_website_queries_with_llm("Latest AI news") == ["ai news"]
+    assert bridge.extract_website_queries_with_llm("  latest ai   NEWS") == ["ai news"]
+    assert bridge.claude_client.messages.create.call_count == 1
+
+def test_extraction_ignores_malformed_queries():
+    """Test that non-list or non-string queries from Claude are dropped."""
+    bridge = _make_bridge()
+    bridge.claude_client = Mock()
+    for content, expected in [('{"queries": "ai news"}', []), ('{"queries": null}', []),
+                              ('{"queries": [{"q": "x"}, "rust"]}', ["rust"])]:
+        bridge.claude_client.messages.create.return_value = Mock(content=[Mock(text=content)])
+        assert bridge.extract_website_queries_with_llm(content) == expected
+
+def test_canonical_url_collapses_variants():
+    """Test that trivially different URLs share one canonical form."""
+    canonical = canonical_url("https://Example.com/page")
+    assert canonical_url("http://example.com/page/") == canonical
+    assert canonical_url("https://example.com/page?utm_source=x&gclid=1#top") == canonical
+    assert canonical_url("https://example.com/page?id=2") != canonical
+
+def test_parse_json_response():
+    """Test JSON parsing of bare and fenced LLM responses."""
+    assert parse_json_response(' {"queries": ["a"]}') == {"queries": ["a"]}
+    assert parse_json_response('Sure:\n```json\n{"queries": ["b"]}\n```') == {"queries": ["b"]}
+    assert parse_json_response("no json here") is None
+
+def test_full_jitter_retry_backoff():
+    """Test that retry backoff is drawn uniformly up to the capped exponential."""
+    retry = FullJitterRetry(total=5, backoff_factor=0.1, backoff_max=0.3)
+    assert retry.get_backoff_time() == 0.0
+
+    for _ in range(3):
+        retry = retry.increment(method="GET", url="/", error=ConnectionError())
+    with patch("search_bridge.random.uniform", return_value=0.25) as uniform:
+        assert retry.get_backoff_time() == 0.25
+    uniform.assert_called_once_with(0, 0.3)
+    assert isinstance(retry, FullJitterRetry)
+
+def test_cache_sqlite_roundtrip(tmp_path):
+    """Test SQLite persistence over the shared connection."""
+    cache = SearchCache(ttl_seconds=300, memory_size=0, db_path=str(tmp_path / "cache.db"))
+    results = [WebResult("Title", "https://example.com", "Description")]
+    cache.set("sqlite test", 5, True, True, results)
+    conn = cache._conn
+
+    assert cache.get("sqlite test", 5, True, True) == results
+    assert cache.get("sqlite test", 5, False, True) is None
+    assert cache._conn is conn
+    cache.close()
+    assert cache._conn is None
+
+def test_cache_connection_closes_when_collected(tmp_path):
+    """Test that a discarded cache does not keep its connection open."""
+    cache = SearchCache(ttl_seconds=300, db_path=str(tmp_path / "cache.db"))
+    conn = cache._conn
+    del cache
+    gc.collect()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+
+def test_cache_set_many(tmp_path):
+    """Test that several entries are written in one batch."""
+    cache = SearchCache(ttl_seconds=300, memory_size=0, db_path=str(tmp_path / "cache.db"))
+    first = [WebResult("One", "https://1.com", "First")]
+    second = [WebResult("Two", "https://2.com", "Second")]
+    cache.set_many([("batch one", 5, True, True, first), ("batch two", 5, True, True, second)])
+
+    assert cache.get("batch one", 5, True, True) == first
+    assert cache.get("batch two", 5, True, True) == second
+
+    cache.set("batch one", 5, True, True, second)
+    assert cache.get("batch one", 5, True, True) == second
+    assert cache._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0] == 2
+
+def test_cache_set_many_survives_unencodable_results(tmp_path):
+    """Test that a serialization failure is logged and caches nothing."""
+    cache = SearchCache(ttl_seconds=300, db_path=str(tmp_path / "cache.db"))
+    good = [WebResult("One", "https://1.com", "First")]
+    bad = [WebResult("Two", "https://2.com", object())]
+    cache.set_many([("good entry", 5, True, True, good), ("bad entry", 5, True, True, bad)])
+
+    assert cache.get("good entry", 5, True, True) is None
+    assert cache.get("bad entry", 5, True, True) is None
+
+def test_cache_sqlite_hits_are_promoted_to_memory(tmp_path):
+    """Test that a SQLite hit fills the in-process layer for later lookups."""
+    db_path = str(tmp_path / "cache.db")
+    results = [WebResult("Title", "https://example.com", "Description")]
+    SearchCache(ttl_seconds=300, db_path=db_path).set("promote test", 5, True, True, results)
+
+    cache = SearchCache(ttl_seconds=300, db_path=db_path)
+    assert cache._memory_get(("promote test", 5, 1, 1)) is None
+    assert cache.get("promote test", 5, True, True) == results
+    assert cache._memory_get(("promote test", 5, 1, 1)) == results
+
+def test_cache_expiry_is_swept_in_bulk(tmp_path):
+    """Test that expired reads do not delete and the sweep removes stale rows."""
+    cache = SearchCache(ttl_seconds=300, memory_size=0, db_path=str(tmp_path / "cache.db"))
+    cache.set("sweep test", 5, True, True, [WebResult("Title", "https://example.com", "Description")])
+    later = time.time() + 301
+
+    with patch("search_bridge.time.time", return_value=later):
+        assert cache.get("sweep test", 5, True, True) is None
+    count_rows = lambda: cache._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+    assert count_rows() == 1
+
+    with cache._db_lock:
+        cache._sweep_expired(later)
+    assert count_rows() == 0
+
+def test_cache_first_write_sweeps(tmp_path):
+    """Test that a new cache sweeps expired rows on its first write."""
+    db_path = str(tmp_path / "cache.db")
+    results = [WebResult("Title", "https://example.com", "Description")]
+    with patch("search_bridge.time.time", return_value=time.time() - 301):
+        SearchCache(ttl_seconds=300, db_path=db_path).set("stale", 5, True, True, results)
+
+    cache = SearchCache(ttl_seconds=300, memory_size=0, db_path=db_path)
+    cache.set("fresh", 5, True, True, results)
+    assert cache._conn.execute("SELECT query FROM search_cache").fetchall() == [("fresh",)]
+
 if __name__ == "__main__":
     pytest.main([__file__]) 
\ No newline at end of file